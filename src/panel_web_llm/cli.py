@@ -6,6 +6,7 @@ import sys
 import panel as pn
 
 from panel_web_llm.main import MODEL_MAPPING
+from panel_web_llm.main import MODEL_SLUGS
 from panel_web_llm.main import WebLLMInterface
 
 
@@ -61,7 +62,7 @@ def main():
         return
 
     if args.command == "run":
-        model_slug = args.model_slug or sorted(value for models in MODEL_MAPPING.values() for sizes in models.values() for value in sizes.values())[0]
+        model_slug = args.model_slug or MODEL_SLUGS[0]
 
         interface = WebLLMInterface(
             model_slug=model_slug,
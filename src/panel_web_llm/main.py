@@ -2,6 +2,9 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+from collections import defaultdict
+from collections import deque
 from collections.abc import Mapping
 from typing import TYPE_CHECKING
 
@@ -13,12 +16,34 @@ from panel.custom import JSComponent
 from panel.models import ReactiveESM
 
 from .models import ModelParam
+from .models import _parse_model_slug
 from .settings import MODEL_MAPPING
+from .settings import MODEL_SLUGS
 
 if TYPE_CHECKING:
     from bokeh.model import Model
 
 
+@functools.lru_cache(maxsize=4)
+def _parse_model_table(text: str) -> dict:
+    """Parses the nested model mapping from the mlc.ai models page."""
+    try:
+        import lxml.html
+    except ImportError:
+        import bs4
+
+        links = bs4.BeautifulSoup(text, "html.parser").find("table").find_all("a")
+        hrefs = [link.get("href") for link in links]
+    else:
+        hrefs = lxml.html.fromstring(text).xpath("(//table)[1]//a/@href")
+    model_mapping: defaultdict = defaultdict(lambda: defaultdict(dict))
+    for href in hrefs:
+        model_slug = href.rsplit("/", 1)[-1]
+        model_name, model_parameters, model_quantization = _parse_model_slug(model_slug)
+        model_mapping[model_name][model_parameters][model_quantization] = model_slug
+    return {model_name: dict(sizes) for model_name, sizes in model_mapping.items()}
+
+
 class WebLLM(JSComponent):
     """
     A Panel component for interacting with WebLLM models.
@@ -45,6 +70,17 @@ class WebLLM(JSComponent):
         The layout type of the widgets.""",
     )
 
+    max_batch_latency = param.Number(
+        default=0.016,
+        bounds=(0, None),
+        doc="""
+        Seconds to wait for further chunks before yielding, so that
+        chunks arriving in quick succession are merged into one update.
+        The frontend already sends streamed tokens at most every 200ms,
+        so this mainly merges bursts; the wait is skipped once the last
+        received chunk is final.""",
+    )
+
     model_slug = param.Selector(default="", doc="The model slug to load.")
 
     model_mapping = param.Dict(default=MODEL_MAPPING, doc="Nested mapping of model names to slugs.")
@@ -81,6 +117,12 @@ class WebLLM(JSComponent):
         Whether the model is currently loading.""",
     )
 
+    rendered = param.Boolean(
+        default=False,
+        doc="""
+        Whether the component has been rendered in the frontend.""",
+    )
+
     refresh = param.Event(
         doc="""
         Click to load the latest available models from https://mlc.ai/models.
@@ -99,87 +141,16 @@ class WebLLM(JSComponent):
             **params:
                 Keyword arguments for the Panel and Param base classes.
         """
-        self._buffer = []
-        load_layout = pn.Column if params.get("load_layout") == "column" else pn.Row
-        self._model_select = pn.widgets.NestedSelect(layout=load_layout)
-        self._model_select_placeholder = pn.pane.Placeholder(
-            object=self._model_select,
-        )
+        self._buffer: deque = deque()
+        self._msg_event: asyncio.Event | None = None
+        self._msg_loop: asyncio.AbstractEventLoop | None = None
+        self._session = None
+        self._loaded_slug = ""
+        self._card: pn.Card | None = None
+        self._updating_select = False
+        self._select_cache: tuple[str, dict] | None = None
+        self._model_slugs: list[str] | None = None
         super().__init__(**params)
-
-        self._history_input = pn.widgets.IntSlider.from_param(
-            self.param.history,
-            disabled=self.param.loading,
-            sizing_mode="stretch_width",
-        )
-        self._temperature_input = pn.widgets.FloatSlider.from_param(
-            self.param.temperature,
-            disabled=self.param.loading,
-            sizing_mode="stretch_width",
-        )
-        self._refresh_button = pn.widgets.ButtonIcon.from_param(
-            self.param.refresh,
-            name="",
-            align="end",
-            icon="refresh",
-            active_icon="check",
-            toggle_duration=1000,
-            margin=(10, -5, 5, 0),
-            size="28px",
-        )
-        self._load_button = pn.widgets.Button.from_param(
-            self.param.load_model,
-            name=param.rx("Load ") + self.param.model_slug,
-            loading=self.param.loading,
-            align=("start", "end"),
-            button_type="primary",
-            description=None,  # override default text
-        )
-        load_status = self.param.load_status.rx()
-        self._submit_row = pn.Row(self._refresh_button, self._load_button, align="end")
-        load_row = load_layout(
-            self._model_select_placeholder,
-            self._submit_row,
-            sizing_mode="stretch_width",
-            margin=0,
-        )
-        config_row = pn.Row(
-            self._temperature_input,
-            self._history_input,
-            sizing_mode="stretch_width",
-            margin=0,
-        )
-        system_input = pn.widgets.TextAreaInput.from_param(
-            self.param.system,
-            auto_grow=True,
-            resizable="height",
-            sizing_mode="stretch_width",
-        )
-        load_progress = pn.Column(
-            pn.indicators.Progress(
-                value=(load_status["progress"] * 100).rx.pipe(int),
-                visible=self.param.loading,
-                sizing_mode="stretch_width",
-                margin=(5, 10, -10, 10),
-                height=30,
-            ),
-            pn.pane.HTML(
-                load_status["text"],
-                visible=load_status.rx.len() > 0,
-            ),
-        )
-        self._card_header = pn.pane.HTML("<b>Model Settings</b>")
-        self._card = pn.Card(
-            load_row,
-            config_row,
-            system_input,
-            load_progress,
-            header=self._card_header,
-            sizing_mode="stretch_width",
-            margin=(5, 20, 5, 0),
-            align="center",
-        )
-        self._model_select.param.watch(self._update_model_slug, "value")
         if pn.state.location:
             pn.state.location.sync(self, {"model_slug": "model_slug"})
 
@@ -208,15 +179,21 @@ class WebLLM(JSComponent):
         dict
             A dictionary representing the model options.
         """
-        model_options = {
-            model_name: {parameters: list(quantizations.keys()) for parameters, quantizations in model_mapping[model_name].items()}
-            for model_name in sorted(model_mapping)
-        }
-        return model_options
+        return {model_name: {parameters: list(quantizations) for parameters, quantizations in sizes.items()} for model_name, sizes in sorted(model_mapping.items())}
 
     @param.depends("model_mapping", watch=True, on_init=True)
     def _update_model_select(self):
         """Updates the model selection widget when the model_mapping changes."""
+        # each instance gets a copy of the default, so compare by value
+        if self.model_mapping == MODEL_MAPPING:
+            model_slugs = MODEL_SLUGS
+        else:
+            model_slugs = sorted(slug for sizes in self.model_mapping.values() for quantizations in sizes.values() for slug in quantizations.values())
+        if model_slugs != self._model_slugs:
+            self._model_slugs = model_slugs
+            self.param["model_slug"].objects = list(model_slugs)
+        if self._card is None:
+            return
         options = self._get_model_options(self.model_mapping)
         levels = [
             {"name": "Model", "sizing_mode": "stretch_width"},
@@ -232,9 +209,6 @@ class WebLLM(JSComponent):
             levels=levels,
             value=value,
         )
-        self.param["model_slug"].objects = sorted(
-            value for models in MODEL_MAPPING.values() for sizes in models.values() for value in sizes.values()
-        )
 
     def _update_model_slug(self, event):
         """
@@ -244,18 +218,39 @@ class WebLLM(JSComponent):
             event (param.parameterized.Event):
                 A change event from the model selection widget.
         """
-        self.model_slug = ModelParam.from_nested_select(self._model_select).lookup_model_slug(self.model_mapping)
+        if self._updating_select:
+            return
+        model_slug = ModelParam.from_nested_select(self._model_select).lookup_model_slug(self.model_mapping)
+        self._select_cache = (model_slug, dict(self._model_select.value))
+        if model_slug != self.model_slug:
+            self.model_slug = model_slug
 
-    @param.depends("model_slug", watch=True)
     def _update_nested_select(self):
         """Updates the nested select widget when the model slug changes."""
-        model_param = ModelParam.from_model_slug(self.model_slug)
-        self._model_select.value = model_param.to_dict(self._model_select.levels)
+        if self._card is None:
+            return
+        if self._select_cache and self._select_cache[0] == self.model_slug:
+            value = self._select_cache[1]
+        else:
+            value = ModelParam.from_model_slug(self.model_slug).to_dict(self._model_select.levels)
+            self._select_cache = (self.model_slug, value)
+        if value == self._model_select.value:
+            return
+        self._updating_select = True
+        try:
+            self._model_select.value = value
+        finally:
+            self._updating_select = False
+
+    @param.depends("system", watch=True, on_init=True)
+    def _update_system_message(self):
+        """Rebuilds the system message sent with every completion."""
+        self._system_message = {"role": "system", "content": self.system}
 
     @param.depends("load_model", watch=True)
     def _load_model(self):
         """Loads the model when the load_model event is triggered."""
-        if self.model_slug in self._card_header.object or self.loading:
+        if self.model_slug == self._loaded_slug or self.loading:
             return
         self.loading = True
         self.load_status = {
@@ -266,28 +261,37 @@ class WebLLM(JSComponent):
 
     @param.depends("multiple_loads", watch=True)
     def _on_multiple_loads(self):
-        if not self.multiple_loads and self.loaded:
+        if not self.multiple_loads and self.loaded and self._card is not None:
             self._card.visible = False
 
     @param.depends("loading", watch=True)
     def _on_loading(self):
-        self._model_select.disabled = self.loading
+        if self._card is not None:
+            self._model_select.disabled = self.loading
 
     @param.depends("loaded", watch=True)
     def _on_loaded(self):
         if self.loaded:
-            self._card.collapsed = True
-            if not self.multiple_loads:
-                self._card.visible = False
-            self._load_button.disabled = True
-            self._card_header.object = f"Model Settings (Loaded: {self.model_slug})"
-        else:
-            self._card.visible = True
-            self._load_button.disabled = False
+            self._loaded_slug = self.model_slug
+        if self._card is None:
+            return
+        with pn.io.hold():
+            if self.loaded:
+                self._card.param.update(
+                    collapsed=True,
+                    visible=self.multiple_loads and self._card.visible,
+                )
+                self._load_button.disabled = True
+                self._card_header.object = f"Model Settings (Loaded: {self.model_slug})"
+            else:
+                self._card.visible = True
+                self._load_button.disabled = False
 
     @param.depends("model_slug", watch=True)
     def _on_model_slug(self):
-        self.loaded = False
+        with pn.io.hold():
+            self._update_nested_select()
+            self.loaded = False
 
     def _handle_msg(self, msg):
         """
@@ -298,7 +302,10 @@ class WebLLM(JSComponent):
                 The message data received from the WebLLM.
         """
         if self.running:
-            self._buffer.insert(0, msg)
+            self._buffer.append(msg)
+            # messages may be delivered on a worker thread when pn.config.nthreads is set
+            if self._msg_event is not None and not self._msg_loop.is_closed():
+                self._msg_loop.call_soon_threadsafe(self._msg_event.set)
 
     async def create_completion(self, messages, response_format=None, stream=False):
         """
@@ -316,7 +323,8 @@ class WebLLM(JSComponent):
         Yields
         -------
         dict
-            The response chunks from the LLM.
+            The response chunks from the LLM; chunks received within
+            `max_batch_latency` of each other are merged into one.
 
         Raises
         -------
@@ -328,19 +336,58 @@ class WebLLM(JSComponent):
         await asyncio.sleep(0.1)
         if not self.loaded:
             return
+        # created lazily since there may be no running loop on construction
+        loop = asyncio.get_running_loop()
+        if self._msg_event is None or self._msg_loop is not loop:
+            self._msg_event = asyncio.Event()
+            self._msg_loop = loop
+        self._msg_event.clear()
         self._send_msg({"type": "completion", "messages": messages, "response_format": response_format, "stream": stream})
         while True:
-            await asyncio.sleep(0.05)
-            if not self._buffer:
+            await self._msg_event.wait()
+            if self.max_batch_latency and self._buffer and not self._buffer[-1]["finish_reason"]:
+                await asyncio.sleep(self.max_batch_latency)
+            self._msg_event.clear()
+            choices = []
+            while self._buffer:
+                choice = self._buffer.popleft()
+                reason = choice["finish_reason"]
+                if reason == "error":
+                    raise RuntimeError("Model not loaded")
+                choices.append(choice)
+                if reason:
+                    break
+            if not choices:
                 continue
-            choice = self._buffer.pop()
-            yield choice
-            reason = choice["finish_reason"]
-            if reason == "error":
-                raise RuntimeError("Model not loaded")
-            elif reason:
+            yield self._merge_choices(choices)
+            if choices[-1]["finish_reason"]:
                 return
 
+    @staticmethod
+    def _merge_choices(choices):
+        """
+        Merges buffered response chunks into a single chunk.
+
+        Parameters
+        ----------
+        choices : list
+            The response chunks in the order they were received.
+
+        Returns
+        -------
+        dict
+            The last chunk with the content of all chunks concatenated.
+        """
+        if len(choices) == 1:
+            return choices[0]
+        deltas = [choice.get("delta") or {} for choice in choices]
+        content = "".join(delta.get("content") or "" for delta in deltas)
+        return {**choices[-1], "delta": {**deltas[0], **deltas[-1], "content": content}}
+
+    def _update_refresh_button(self, icon, description):
+        if self._card is not None:
+            self._refresh_button.param.update(icon=icon, active_icon="x", description=description)
+
     @param.depends("refresh", watch=True)
     def refresh_model_mapping(self):
         """
@@ -349,32 +396,30 @@ class WebLLM(JSComponent):
         This method scrapes the mlc.ai website to get the available models and their
         parameters.
 
-        Requires bs4 and requests to be installed.
+        Requires requests and either lxml or bs4 to be installed.
         """
-        import bs4
-        import requests  # type: ignore
+        try:
+            import requests  # type: ignore
+        except ImportError:
+            self._update_refresh_button("package-off", "Refreshing models requires requests.")
+            return
 
+        if self._session is None:
+            self._session = requests.Session()
         try:
-            text = requests.get("https://mlc.ai/models#mlc-models").text
+            text = self._session.get("https://mlc.ai/models#mlc-models").text
         except requests.ConnectionError:
-            self._refresh_button.param.update(icon="wifi-off", active_icon="x", description="Connection unavailable.")
+            self._update_refresh_button("wifi-off", "Connection unavailable.")
+            return
+        try:
+            model_mapping = _parse_model_table(text)
+        except ImportError:
+            self._update_refresh_button("package-off", "Refreshing models requires lxml or bs4.")
             return
-        soup = bs4.BeautifulSoup(text, "html.parser")
-        table = soup.find("table")
-        links = table.find_all("a")
-        model_mapping: dict = {}
-        for link in links:
-            model_slug = link.get("href").rsplit("/", 1)[-1]
-            model_params = ModelParam.from_model_slug(model_slug)
-            model_name = model_params.model
-            model_parameters = model_params.size
-            model_quantization = model_params.quantization
-            if model_name not in model_mapping:
-                model_mapping[model_name] = {}
-            if model_parameters not in model_mapping[model_name]:
-                model_mapping[model_name][model_parameters] = {}
-            model_mapping[model_name][model_parameters][model_quantization] = model_slug
-        self.model_mapping = model_mapping
+        # copy so instances sharing a cached parse cannot mutate each other's mapping
+        self.model_mapping = {
+            model_name: {parameters: dict(quantizations) for parameters, quantizations in sizes.items()} for model_name, sizes in model_mapping.items()
+        }
 
     async def callback(self, contents: str, user: str, instance: ChatInterface):
         """
@@ -406,22 +451,107 @@ class WebLLM(JSComponent):
         self.running = False
         self._buffer.clear()
 
-        messages = [{"role": "system", "content": self.system}] + instance.serialize(limit=self.history)
+        messages = [self._system_message, *instance.serialize(limit=self.history)]
 
         message = ""
         async for chunk in self.create_completion(messages):
             message += chunk["delta"].get("content", "")
             yield message
 
-    @property
+    @functools.cached_property
     def menu(self):
         """
-        Returns the model selection widget.
+        Returns the model settings card.
+
+        The widgets are only constructed on first access, so components
+        that never display the menu do not pay for them.
 
         Returns
         -------
-        pn.widgets.NestedSelect: The model selection widget.
+        pn.Card: The model settings card.
         """
+        load_layout = pn.Column if self.load_layout == "column" else pn.Row
+        self._model_select = pn.widgets.NestedSelect(layout=load_layout, disabled=self.loading)
+        self._model_select_placeholder = pn.pane.Placeholder(
+            object=self._model_select,
+        )
+        self._history_input = pn.widgets.IntSlider.from_param(
+            self.param.history,
+            disabled=self.param.loading,
+            sizing_mode="stretch_width",
+        )
+        self._temperature_input = pn.widgets.FloatSlider.from_param(
+            self.param.temperature,
+            disabled=self.param.loading,
+            sizing_mode="stretch_width",
+        )
+        self._refresh_button = pn.widgets.ButtonIcon.from_param(
+            self.param.refresh,
+            name="",
+            align="end",
+            icon="refresh",
+            active_icon="check",
+            toggle_duration=1000,
+            margin=(10, -5, 5, 0),
+            size="28px",
+        )
+        self._load_button = pn.widgets.Button.from_param(
+            self.param.load_model,
+            name=param.rx("Load ") + self.param.model_slug,
+            loading=self.param.loading,
+            align=("start", "end"),
+            button_type="primary",
+            description=None,  # override default text
+        )
+        load_status = self.param.load_status.rx()
+        self._submit_row = pn.Row(self._refresh_button, self._load_button, align="end")
+        load_row = load_layout(
+            self._model_select_placeholder,
+            self._submit_row,
+            sizing_mode="stretch_width",
+            margin=0,
+        )
+        config_row = pn.Row(
+            self._temperature_input,
+            self._history_input,
+            sizing_mode="stretch_width",
+            margin=0,
+        )
+        system_input = pn.widgets.TextAreaInput.from_param(
+            self.param.system,
+            auto_grow=True,
+            resizable="height",
+            sizing_mode="stretch_width",
+        )
+        load_progress = pn.Column(
+            pn.indicators.Progress(
+                value=(load_status["progress"] * 100).rx.pipe(int),
+                visible=self.param.loading,
+                sizing_mode="stretch_width",
+                margin=(5, 10, -10, 10),
+                height=30,
+            ),
+            pn.pane.HTML(
+                load_status["text"],
+                visible=load_status.rx.len() > 0,
+            ),
+        )
+        header = f"Model Settings (Loaded: {self._loaded_slug})" if self._loaded_slug else "<b>Model Settings</b>"
+        self._card_header = pn.pane.HTML(header)
+        self._card = pn.Card(
+            load_row,
+            config_row,
+            system_input,
+            load_progress,
+            header=self._card_header,
+            sizing_mode="stretch_width",
+            margin=(5, 20, 5, 0),
+            align="center",
+        )
+        # populate the widgets before watching to avoid a spurious model_slug update
+        self._update_model_select()
+        self._on_loaded()
+        self._model_select.param.watch(self._update_model_slug, "value")
         return self._card
 
 
@@ -466,17 +596,19 @@ class WebLLMComponentMixin(param.Parameterized):
         self.callback = self.web_llm.callback
         self.edit_callback = self._edit_callback
         self.header = pn.Column(self.web_llm.menu, self.web_llm)
-        pn.state.onload(self._onload)
+        if self.load_on_init:
+            # load as soon as the frontend can receive the load message
+            self.web_llm.param.watch(self._onload, "rendered")
+        else:
+            self.help_text = "Please first load the model, then start chatting."
 
     def _edit_callback(self, contents, index, instance):
         instance.objects = instance.objects[: index + 1]
         self.respond()
 
-    def _onload(self):
-        if self.load_on_init:
+    def _onload(self, event):
+        if event.new:
             self.web_llm.load_model = True
-        else:
-            self.help_text = "Please first load the model, then start chatting."
 
 
 class WebLLMFeed(ChatFeed, WebLLMComponentMixin):
@@ -2,11 +2,28 @@
 
 from __future__ import annotations
 
+import functools
 import re
 
 import panel as pn
 import param
 
+_PARAM_RE = re.compile(r"\d+(\.\d+)?[BbKkmM]")
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_model_slug(model_slug: str) -> tuple[str, str, str]:
+    """Splits a model slug into its model name, size, and quantization."""
+    model_label, model_quantization, _ = model_slug.rsplit("-", 2)
+    model_parameters_re = _PARAM_RE.search(model_label)
+    if model_parameters_re:
+        model_parameters = model_parameters_re.group(0)
+        model_name = model_label[: model_parameters_re.start()].rstrip("-").rstrip("_")
+    else:
+        model_parameters = "-"
+        model_name = model_label.rstrip("-").rstrip("_")
+    return model_name, model_parameters, model_quantization
+
 
 class ModelParam(param.Parameterized):
     """A class to represent model parameters including model name, size, and quantization.
@@ -96,12 +113,5 @@ class ModelParam(param.Parameterized):
         -------
             ModelParam: A ModelParam instance initialized with the parsed values from the model slug.
         """
-        model_label, model_quantization, _ = model_slug.rsplit("-", 2)
-        model_parameters_re = re.search(r"\d+(\.\d+)?[BbKkmM]", model_label)
-        if model_parameters_re:
-            model_parameters = model_parameters_re.group(0)
-            model_name = model_label[: model_parameters_re.start()].rstrip("-").rstrip("_")
-        else:
-            model_parameters = "-"
-            model_name = model_label.rstrip("-").rstrip("_")
+        model_name, model_parameters, model_quantization = _parse_model_slug(model_slug)
         return cls(model=model_name, size=model_parameters, quantization=model_quantization)
@@ -374,3 +374,5 @@ MODEL_MAPPING = {
         },
     },
 }
+
+MODEL_SLUGS = sorted(slug for sizes in MODEL_MAPPING.values() for quantizations in sizes.values() for slug in quantizations.values())
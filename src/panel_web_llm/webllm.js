@@ -54,7 +54,6 @@ export async function render({ model }) {
         let timeout = null
         const sendBuffer = () => {
           if (buffer) {
-            console.log(buffer)
             model.send_msg({
               delta: { content: buffer, role: current.delta.role },
               index: current.index,
@@ -88,4 +87,5 @@ export async function render({ model }) {
       }
     }
   })
+  model.rendered = true
 }
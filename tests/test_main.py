@@ -1,8 +1,15 @@
+import asyncio
+import sys
+import threading
+
 import panel as pn
 import pytest
 
+from panel_web_llm.main import MODEL_MAPPING
+from panel_web_llm.main import MODEL_SLUGS
 from panel_web_llm.main import WebLLM
 from panel_web_llm.main import WebLLMInterface
+from panel_web_llm.main import _parse_model_table
 
 
 class TestWebLLM:
@@ -11,7 +18,9 @@ class TestWebLLM:
     @pytest.fixture
     def web_llm(self):
         """Create a basic WebLLM instance for testing."""
-        return WebLLM()
+        web_llm = WebLLM()
+        web_llm.menu  # noqa: B018
+        return web_llm
 
     def test_initialization(self, web_llm):
         """Test initial state of WebLLM component."""
@@ -23,6 +32,18 @@ class TestWebLLM:
         assert web_llm.multiple_loads
         assert web_llm.load_status == {"text": "", "progress": 0}
 
+    def test_menu_lazy_construction(self):
+        """Test widgets are only constructed once the menu is accessed."""
+        web_llm = WebLLM(model_slug="Qwen2.5-Coder-0.5B-Instruct-q0f16-MLC")
+        assert web_llm._card is None
+
+        web_llm.loaded = True
+        menu = web_llm.menu
+        assert menu is web_llm._card
+        assert web_llm.menu is menu
+        assert web_llm._load_button.disabled is True
+        assert web_llm._model_select.value["Model"] == "Qwen2.5-Coder"
+
     def test_model_select_initialization(self, web_llm):
         """Test model selection widget initialization."""
         assert web_llm._model_select.disabled is False
@@ -37,6 +58,38 @@ class TestWebLLM:
         assert web_llm._model_select.disabled is loading_state
         assert web_llm._temperature_input.disabled is loading_state
 
+    def test_model_select_round_trip(self, web_llm):
+        """Test selecting a model updates the slug without re-entering the select watcher."""
+        calls = []
+        web_llm._model_select.param.watch(lambda event: calls.append(event.new), "value")
+        web_llm._model_select.value = {"Model": "Qwen2.5-Coder", "Size": "0.5B", "Quantization": "q0f16"}
+
+        assert web_llm.model_slug == "Qwen2.5-Coder-0.5B-Instruct-q0f16-MLC"
+        assert len(calls) == 1
+
+        web_llm.model_slug = "gemma-2-27b-it-q4f16_1-MLC"
+        assert web_llm._model_select.value == {"Model": "gemma-2", "Size": "27b", "Quantization": "q4f16_1"}
+
+    def test_default_model_mapping_slugs(self, web_llm):
+        """Test the default mapping reuses the precomputed slugs."""
+        assert web_llm._model_slugs is MODEL_SLUGS
+
+    def test_default_model_mapping_copied(self, web_llm):
+        """Test mutating an instance mapping does not leak into the default."""
+        web_llm.model_mapping["custom"] = {"1B": {"q0f16": "custom-1B-q0f16-MLC"}}
+        assert "custom" not in MODEL_MAPPING
+        assert "custom" not in WebLLM().model_mapping
+
+    def test_model_mapping_updates_slugs(self, web_llm):
+        """Test model_slug objects follow the model_mapping."""
+        model_mapping = {"gemma-2": {"27b": {"q0f16": "gemma-2-27b-it-q0f16-MLC"}}}
+        web_llm.model_mapping = model_mapping
+        assert web_llm.param["model_slug"].objects == ["gemma-2-27b-it-q0f16-MLC"]
+
+        model_slugs = web_llm._model_slugs
+        web_llm.model_mapping = dict(model_mapping)
+        assert web_llm._model_slugs is model_slugs
+
     def test_load_button_state_changes(self, web_llm):
         """Test load button state changes."""
         web_llm.loaded = True
@@ -50,6 +103,7 @@ class TestWebLLM:
     def test_multiple_loads_behavior(self):
         """Test behavior when multiple loads is disabled."""
         web_llm = WebLLM(multiple_loads=False)
+        web_llm.menu  # noqa: B018
         web_llm.loaded = True
 
         assert web_llm._card.visible is False
@@ -59,6 +113,12 @@ class TestWebLLM:
         assert web_llm._card.visible is True
         assert web_llm._load_button.disabled is False
 
+    def test_system_message(self, web_llm):
+        """Test the system message follows the system prompt."""
+        assert web_llm._system_message == {"role": "system", "content": web_llm.system}
+        web_llm.system = "Test system prompt"
+        assert web_llm._system_message == {"role": "system", "content": "Test system prompt"}
+
     def test_load_status_updates(self, web_llm):
         """Test load status updates during model loading."""
         web_llm.model_slug = "Qwen2.5-Coder-0.5B-Instruct-q0f16-MLC"
@@ -81,6 +141,122 @@ class TestWebLLM:
         web_llm._handle_msg(test_msg)
         assert len(web_llm._buffer) == 0
 
+    @staticmethod
+    async def _start_completion(web_llm):
+        """Start a completion and return its task and the list it collects chunks into."""
+        web_llm.loaded = True
+        web_llm.running = True
+        chunks = []
+
+        async def consume():
+            async for chunk in web_llm.create_completion([]):
+                chunks.append(chunk)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.2)
+        return task, chunks
+
+    async def test_create_completion_wakes_on_msg(self, web_llm):
+        """Test a chunk is yielded as soon as it is received."""
+        task, chunks = await self._start_completion(web_llm)
+        web_llm._handle_msg({"finish_reason": None, "delta": {"content": "a"}})
+        await asyncio.sleep(0.1)
+        assert [chunk["delta"]["content"] for chunk in chunks] == ["a"]
+
+        web_llm._handle_msg({"finish_reason": "stop", "delta": {"content": "b"}})
+        await asyncio.wait_for(task, timeout=1)
+        assert [chunk["delta"]["content"] for chunk in chunks] == ["a", "b"]
+
+    async def test_create_completion_wakes_on_threaded_msg(self, web_llm):
+        """Test a chunk delivered from a worker thread wakes the completion."""
+        task, chunks = await self._start_completion(web_llm)
+        msg = {"finish_reason": "stop", "delta": {"content": "a"}}
+        # deliver the message while the loop is idle, as Panel does with pn.config.nthreads
+        thread = threading.Timer(0.1, web_llm._handle_msg, args=(msg,))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        thread.start()
+        await asyncio.wait_for(task, timeout=2)
+        thread.join()
+
+        assert loop.time() - start < 0.5
+        assert [chunk["delta"]["content"] for chunk in chunks] == ["a"]
+
+    async def test_create_completion_merges_chunks(self, web_llm):
+        """Test completion chunks received together are merged into one."""
+        task, chunks = await self._start_completion(web_llm)
+        web_llm._handle_msg({"finish_reason": None, "delta": {"content": "a"}})
+        web_llm._handle_msg({"finish_reason": "stop", "delta": {"content": "b"}})
+        await asyncio.wait_for(task, timeout=1)
+
+        assert [chunk["delta"]["content"] for chunk in chunks] == ["ab"]
+        assert chunks[0]["finish_reason"] == "stop"
+
+    async def test_create_completion_final_chunk_not_delayed(self, web_llm):
+        """Test a final chunk is yielded without waiting for further chunks."""
+        web_llm.max_batch_latency = 10
+        task, chunks = await self._start_completion(web_llm)
+        web_llm._handle_msg({"finish_reason": "stop", "delta": {"content": "done"}})
+        await asyncio.wait_for(task, timeout=1)
+
+        assert [chunk["delta"]["content"] for chunk in chunks] == ["done"]
+
+    async def test_create_completion_error(self, web_llm):
+        """Test an error chunk raises instead of being yielded."""
+        task, chunks = await self._start_completion(web_llm)
+        web_llm._handle_msg({"finish_reason": "error"})
+        with pytest.raises(RuntimeError, match="Model not loaded"):
+            await asyncio.wait_for(task, timeout=1)
+        assert chunks == []
+
+
+@pytest.mark.parametrize("parser", ["lxml", "bs4"])
+def test_parse_model_table(parser, monkeypatch):
+    """Test the model mapping is parsed from the first table of the models page."""
+    pytest.importorskip(parser)
+    if parser == "bs4":
+        monkeypatch.setitem(sys.modules, "lxml", None)
+        monkeypatch.setitem(sys.modules, "lxml.html", None)
+    _parse_model_table.cache_clear()
+    text = """
+    <html><body>
+    <table>
+      <tr><td><a href="https://huggingface.co/mlc-ai/gemma-2-27b-it-q0f16-MLC">gemma</a></td></tr>
+      <tr><td><a href="https://huggingface.co/mlc-ai/gemma-2-27b-it-q4f16_1-MLC">gemma</a></td></tr>
+    </table>
+    <table><tr><td><a href="https://huggingface.co/mlc-ai/other-1B-q0f16-MLC">other</a></td></tr></table>
+    </body></html>
+    """
+    model_mapping = _parse_model_table(text)
+    assert model_mapping == {
+        "gemma-2": {"27b": {"q0f16": "gemma-2-27b-it-q0f16-MLC", "q4f16_1": "gemma-2-27b-it-q4f16_1-MLC"}},
+    }
+    assert type(model_mapping["gemma-2"]) is dict
+    assert _parse_model_table(text) is model_mapping
+
+
+def test_refresh_missing_parser(monkeypatch):
+    """Test a missing HTML parser is reported on the refresh button."""
+    pytest.importorskip("requests")
+    web_llm = WebLLM()
+    web_llm.menu  # noqa: B018
+
+    class Response:
+        text = "<table><a href='missing-parser-1B-q0f16-MLC'></a></table>"
+
+    class Session:
+        def get(self, url):
+            return Response()
+
+    monkeypatch.setitem(sys.modules, "lxml", None)
+    monkeypatch.setitem(sys.modules, "lxml.html", None)
+    monkeypatch.setitem(sys.modules, "bs4", None)
+    web_llm._session = Session()
+    web_llm.refresh_model_mapping()
+
+    assert web_llm._refresh_button.icon == "package-off"
+    assert "lxml or bs4" in web_llm._refresh_button.description
+
 
 class TestWebLLMInterface:
     """Test suite for the WebLLMInterface component."""
@@ -107,6 +283,15 @@ class TestWebLLMInterface:
         assert hasattr(interface, "help_text")
         assert "Please first load the model" in interface.help_text
 
+    def test_load_on_render(self):
+        """Test the model is loaded once the component is rendered when load_on_init is enabled."""
+        interface = WebLLMInterface(model_slug="Qwen2.5-Coder-0.5B-Instruct-q0f16-MLC", load_on_init=True)
+        assert not interface.web_llm.loading
+
+        interface.web_llm.rendered = True
+        assert interface.web_llm.loading
+        assert "Preparing to load" in interface.web_llm.load_status["text"]
+
     def test_model_menu_visibility(self, web_llm_interface):
         """Test model menu visibility states."""
         assert web_llm_interface.web_llm.menu.visible is True